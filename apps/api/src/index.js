@@ -5,6 +5,8 @@ const PORT = process.env.PORT || 8080
 const PANEL_ORIGIN = process.env.PANEL_BASE_URL || process.env.CORS_ORIGIN
 const DAILY_CLAIM = Number(process.env.DAILY_CLAIM || 100)
 const MARKET_FEE_PCT = Number(process.env.MARKET_FEE || 0.08)
+const MARKET_FEE_PERCENT = BigInt(Math.round(MARKET_FEE_PCT * 100))
+const DAY_MS = 24 * 60 * 60 * 1000
 
 const app = Fastify({ logger: true })
 
@@ -24,27 +26,104 @@ app.options('/*', async (_, reply) => {
 
 app.get('/healthz', async () => ({ ok: true }))
 
+// --- Response schemas ---
+// Declaring response shapes lets Fastify compile a dedicated serializer per route
+// instead of falling back to generic JSON.stringify.
+const dateTime = { type: 'string', format: 'date-time' }
+const userItem = {
+  type: 'object',
+  properties: {
+    id: { type: 'integer' },
+    discord_id: { type: 'string' },
+    username: { type: 'string', nullable: true },
+    wallet_balance: { type: 'number' },
+    escrow_balance: { type: 'number' },
+    frozen: { type: 'boolean' },
+    created_at: dateTime,
+  },
+}
+const leaderboardItem = {
+  type: 'object',
+  properties: {
+    discord_id: { type: 'string' },
+    username: { type: 'string', nullable: true },
+    wallet_balance: { type: 'number' },
+  },
+}
+const walletView = {
+  type: 'object',
+  properties: {
+    discord_id: { type: 'string' },
+    wallet_balance: { type: 'number' },
+    escrow_balance: { type: 'number' },
+    last_daily_claim_at: { ...dateTime, nullable: true },
+  },
+}
+const listingItem = {
+  type: 'object',
+  properties: {
+    id: { type: 'integer' },
+    title: { type: 'string' },
+    price: { type: 'number' },
+    created_at: dateTime,
+  },
+}
+const questItem = {
+  type: 'object',
+  properties: {
+    id: { type: 'integer' },
+    title: { type: 'string' },
+    description: { type: 'string', nullable: true },
+    reward: { type: 'number' },
+  },
+}
+const itemsOf = (item) => ({ type: 'object', properties: { items: { type: 'array', items: item } } })
+
+// Writable GuildConfig fields. Unknown keys are stripped and values coerced by Fastify's
+// validator before the handler runs, so the upsert only ever sees typed columns.
+const channelId = { type: 'string', nullable: true }
+const guildConfigBody = {
+  type: 'object',
+  additionalProperties: false,
+  properties: {
+    categoryId: channelId,
+    hubChannelId: channelId,
+    shopChannelId: channelId,
+    leaderboardChannelId: channelId,
+    questsChannelId: channelId,
+    announcementsChannelId: channelId,
+    announcementIntervalMinutes: { type: 'integer', minimum: 0, nullable: true },
+    transactionsChannelId: channelId,
+    milestoneChannelId: channelId,
+  },
+}
+
 // --- DB helpers ---
-async function ensureUser(discordId, username) {
-  const user = await prisma.user.upsert({
+async function ensureUser(discordId, username, db = prisma) {
+  const user = await db.user.upsert({
     where: { discordId },
     create: { discordId, username, wallet: { create: {} } },
     update: { username },
     include: { wallet: true },
   })
-  if (!user.wallet) {
-    await prisma.wallet.create({ data: { userId: user.id } })
-  }
-  return prisma.user.findUnique({ where: { discordId }, include: { wallet: true } })
+  if (user.wallet) return user
+  const wallet = await db.wallet.create({ data: { userId: user.id } })
+  return { ...user, wallet }
 }
 
+// Turns a guarded update that matched no row (Prisma P2025) into a domain error code.
+const failWith = (code) => (e) => { throw e?.code === 'P2025' ? new Error(code) : e }
+
 // --- Users ---
-app.get('/users', async (req) => {
+app.get('/users', { schema: { response: { 200: itemsOf(userItem) } } }, async (req) => {
   const limit = Math.min(Number(req.query?.limit ?? 50), 200)
   const users = await prisma.user.findMany({
     take: limit,
     orderBy: { id: 'asc' },
-    include: { wallet: true },
+    select: {
+      id: true, discordId: true, username: true, frozen: true, createdAt: true,
+      wallet: { select: { walletBalance: true, escrowBalance: true } },
+    },
   })
   return { items: users.map(u => ({
     id: u.id,
@@ -57,8 +136,40 @@ app.get('/users', async (req) => {
   })) }
 })
 
+// --- Leaderboard ---
+// The leaderboard is read far more often than balances change, so results are cached per limit
+// and dropped whenever a balance write commits. A read that overlaps a write is not cached (the
+// version moved underneath it); the TTL bounds staleness from other edits such as usernames.
+const LEADERBOARD_TTL_MS = 30 * 1000
+const leaderboardCache = new Map()
+let balancesVersion = 0
+
+function balancesChanged() {
+  balancesVersion++
+  leaderboardCache.clear()
+}
+
+app.get('/leaderboard', { schema: { response: { 200: itemsOf(leaderboardItem) } } }, async (req) => {
+  const limit = Math.max(1, Math.min(Math.trunc(Number(req.query?.limit)) || 10, 50))
+  const hit = leaderboardCache.get(limit)
+  if (hit && Date.now() - hit.at < LEADERBOARD_TTL_MS) return hit.body
+  const version = balancesVersion
+  const wallets = await prisma.wallet.findMany({
+    take: limit,
+    orderBy: { walletBalance: 'desc' },
+    select: { walletBalance: true, user: { select: { discordId: true, username: true } } },
+  })
+  const body = { items: wallets.map(w => ({
+    discord_id: w.user.discordId,
+    username: w.user.username,
+    wallet_balance: Number(w.walletBalance),
+  })) }
+  if (version === balancesVersion) leaderboardCache.set(limit, { at: Date.now(), body })
+  return body
+})
+
 // --- Wallet endpoints ---
-app.get('/wallet/:discordId', async (req, reply) => {
+app.get('/wallet/:discordId', { schema: { response: { 200: walletView } } }, async (req, reply) => {
   const { discordId } = req.params
   const user = await prisma.user.findUnique({ where: { discordId }, include: { wallet: true } })
   if (!user) { reply.code(404); return { error: 'not_found' } }
@@ -77,19 +188,20 @@ app.post('/wallet/earn', async (req, reply) => {
   try {
     const res = await prisma.$transaction(async (tx) => {
       if (idem) {
-        const exists = await tx.transaction.findFirst({ where: { idemKey: String(idem) } })
+        const exists = await tx.transaction.findUnique({ where: { idemKey: String(idem) } })
         if (exists) return { reused: true, tx: exists }
       }
-      const user = await ensureUser(discord_id, username)
-      const before = user.wallet?.walletBalance ?? 0n
-      const after = before + BigInt(amount)
-      await tx.wallet.update({ where: { userId: user.id }, data: { walletBalance: after } })
+      const user = await ensureUser(discord_id, username, tx)
+      const wallet = await tx.wallet.update({ where: { userId: user.id }, data: { walletBalance: { increment: BigInt(amount) } } })
+      const after = wallet.walletBalance
+      const before = after - BigInt(amount)
       const t = await tx.transaction.create({ data: {
         type: 'earn', userId: user.id, amount: BigInt(amount), fee: 0n,
         beforeBalance: before, afterBalance: after, meta: { reason }, idemKey: idem ? String(idem) : null,
       }})
       return { reused: false, tx: t }
     })
+    if (!res.reused) balancesChanged()
     reply.code(res.reused ? 200 : 201)
     return { ok: true, tx_id: res.tx.id }
   } catch (e) {
@@ -102,33 +214,46 @@ app.post('/wallet/claim', async (req, reply) => {
   const { discord_id, username } = req.body || {}
   if (!discord_id) { reply.code(400); return { error: 'bad_request' } }
   const user = await ensureUser(discord_id, username)
-  const now = new Date()
-  if (user.lastDailyClaimAt) {
-    const delta = now.getTime() - new Date(user.lastDailyClaimAt).getTime()
-    if (delta < 24*60*60*1000) { reply.code(429); return { error: 'cooldown', next_at: new Date(new Date(user.lastDailyClaimAt).getTime() + 24*60*60*1000).toISOString() } }
+  const now = Date.now()
+  const cooldown = (last) => {
+    reply.code(429)
+    return { error: 'cooldown', next_at: new Date(last.getTime() + DAY_MS).toISOString() }
   }
+  if (user.lastDailyClaimAt && now < user.lastDailyClaimAt.getTime() + DAY_MS) return cooldown(user.lastDailyClaimAt)
   try {
     let after = 0n
     await prisma.$transaction(async (tx) => {
-      const u = await tx.user.update({ where: { id: user.id }, data: { lastDailyClaimAt: now } })
-      const wallet = await tx.wallet.findUnique({ where: { userId: u.id } })
-      const before = wallet?.walletBalance ?? 0n
-      after = before + BigInt(DAILY_CLAIM)
-      await tx.wallet.update({ where: { userId: u.id }, data: { walletBalance: after } })
+      // The cooldown is re-checked by the update itself, so two simultaneous claims can't both
+      // pass the read above and pay out twice.
+      const u = await tx.user.update({
+        where: { id: user.id, OR: [{ lastDailyClaimAt: null }, { lastDailyClaimAt: { lte: new Date(now - DAY_MS) } }] },
+        data: { lastDailyClaimAt: new Date(now) },
+      }).catch(failWith('cooldown'))
+      const wallet = await tx.wallet.update({ where: { userId: u.id }, data: { walletBalance: { increment: BigInt(DAILY_CLAIM) } } })
+      after = wallet.walletBalance
+      const before = after - BigInt(DAILY_CLAIM)
       await tx.transaction.create({ data: {
         type: 'earn', userId: u.id, amount: BigInt(DAILY_CLAIM), fee: 0n,
         beforeBalance: before, afterBalance: after, meta: { reason: 'daily_claim' }, idemKey: null,
       }})
     })
+    balancesChanged()
     return { ok: true, amount: DAILY_CLAIM, balance: Number(after) }
   } catch (e) {
+    if (e?.message === 'cooldown') {
+      const latest = await prisma.user.findUnique({ where: { id: user.id }, select: { lastDailyClaimAt: true } })
+      return cooldown(latest?.lastDailyClaimAt ?? new Date(now))
+    }
     reply.code(500); return { error: 'server_error' }
   }
 })
 
 // --- Listings API (DB) ---
-app.get('/listings', async () => {
-  const rows = await prisma.listing.findMany({ orderBy: { createdAt: 'desc' }, take: 100 })
+app.get('/listings', { schema: { response: { 200: itemsOf(listingItem) } } }, async (req) => {
+  const limit = Math.max(1, Math.min(Math.trunc(Number(req.query?.limit)) || 100, 100))
+  // The shop only wants buyable rows; the panel passes ?status=all to see sold listings too.
+  const where = req.query?.status === 'all' ? {} : { status: 'active' }
+  const rows = await prisma.listing.findMany({ where, orderBy: { createdAt: 'desc' }, take: limit, select: { id: true, title: true, price: true, createdAt: true } })
   return { items: rows.map(r => ({ id: r.id, title: r.title, price: Number(r.price), created_at: r.createdAt })) }
 })
 app.post('/listings', async (req, reply) => {
@@ -161,38 +286,42 @@ app.post('/orders', async (req, reply) => {
       if (!listing || listing.status !== 'active') throw new Error('listing_unavailable')
       if (listing.qty < quantity) throw new Error('insufficient_qty')
 
-      const buyer = await ensureUser(String(buyer_discord_id), username)
-      const seller = await tx.user.findUnique({ where: { id: listing.sellerId }, include: { wallet: true } })
+      const buyer = await ensureUser(String(buyer_discord_id), username, tx)
+      const seller = await tx.user.findUnique({ where: { id: listing.sellerId } })
       if (!seller) throw new Error('seller_missing')
 
       const unit = listing.price
       const total = unit * BigInt(quantity)
-      const feePct = Math.round(MARKET_FEE_PCT * 100) // percent * 100
-      const fee = (total * BigInt(feePct)) / 100n
+      const fee = (total * MARKET_FEE_PERCENT) / 100n
       const sellerProceeds = total - fee
 
-      const buyerWallet = await tx.wallet.findUnique({ where: { userId: buyer.id } })
-      const buyerBefore = buyerWallet?.walletBalance ?? 0n
-      if (buyerBefore < total) throw new Error('insufficient_funds')
-      const buyerAfter = buyerBefore - total
-      await tx.wallet.update({ where: { userId: buyer.id }, data: { walletBalance: buyerAfter } })
+      // Stock and funds are checked by the same statements that take them, so concurrent orders
+      // serialize on the row locks instead of both passing a stale read and overselling/overdrawing.
+      const stock = await tx.listing.update({
+        where: { id: listing.id, status: 'active', qty: { gte: quantity } },
+        data: { qty: { decrement: quantity } },
+      }).catch(failWith('insufficient_qty'))
+      if (stock.qty <= 0) await tx.listing.update({ where: { id: listing.id }, data: { status: 'sold' } })
+
+      const buyerWallet = await tx.wallet.update({
+        where: { userId: buyer.id, walletBalance: { gte: total } },
+        data: { walletBalance: { decrement: total } },
+      }).catch(failWith('insufficient_funds'))
+      const buyerAfter = buyerWallet.walletBalance
+      const buyerBefore = buyerAfter + total
       await tx.transaction.create({ data: {
         type: 'spend', userId: buyer.id, amount: total, fee: 0n,
         beforeBalance: buyerBefore, afterBalance: buyerAfter, meta: { reason: 'buy', listing_id, qty: quantity }, idemKey: null,
       }})
 
-      const sellerWallet = await tx.wallet.findUnique({ where: { userId: seller.id } })
-      const sellerBefore = sellerWallet?.walletBalance ?? 0n
-      const sellerAfter = sellerBefore + sellerProceeds
-      await tx.wallet.update({ where: { userId: seller.id }, data: { walletBalance: sellerAfter } })
+      const sellerWallet = await tx.wallet.update({ where: { userId: seller.id }, data: { walletBalance: { increment: sellerProceeds } } })
+      const sellerAfter = sellerWallet.walletBalance
+      const sellerBefore = sellerAfter - sellerProceeds
       await tx.transaction.create({ data: {
         type: 'earn', userId: seller.id, amount: sellerProceeds, fee: fee,
         beforeBalance: sellerBefore, afterBalance: sellerAfter, meta: { reason: 'sell', listing_id, qty: quantity }, idemKey: null,
       }})
 
-      const newQty = listing.qty - quantity
-      await tx.listing.update({ where: { id: listing.id }, data: { qty: newQty, status: newQty <= 0 ? 'sold' : 'active' } })
-
       const order = await tx.order.create({ data: {
         listingId: listing.id,
         buyerId: buyer.id,
@@ -204,6 +333,7 @@ app.post('/orders', async (req, reply) => {
       }})
       return { order, total, fee, proceeds: sellerProceeds }
     })
+    balancesChanged()
     reply.code(201)
     return { ok: true, order_id: res.order.id, total: Number(res.total), fee: Number(res.fee) }
   } catch (e) {
@@ -222,7 +352,7 @@ app.get('/config/:guildId', async (req, reply) => {
   return cfg
 })
 
-app.put('/config/:guildId', async (req) => {
+app.put('/config/:guildId', { schema: { body: guildConfigBody } }, async (req) => {
   const { guildId } = req.params
   const data = req.body || {}
   const cfg = await prisma.guildConfig.upsert({
@@ -234,7 +364,7 @@ app.put('/config/:guildId', async (req) => {
 })
 
 // --- Quests ---
-app.get('/quests/:guildId', async (req) => {
+app.get('/quests/:guildId', { schema: { response: { 200: { type: 'array', items: questItem } } } }, async (req) => {
   const { guildId } = req.params
   const rows = await prisma.quest.findMany({ where: { guildId }, orderBy: { createdAt: 'asc' } })
   return rows.map(q => ({ id: q.id, title: q.title, description: q.description, reward: Number(q.reward) }))
@@ -291,6 +421,25 @@ app.post('/admin/message', async (req, reply) => {
   }
 })
 
+// One heartbeat timer for all SSE clients instead of one interval per connection; it only
+// runs while at least one client is connected.
+const txStreamClients = new Set()
+let txHeartbeat = null
+
+function addTxStreamClient(raw) {
+  txStreamClients.add(raw)
+  if (!txHeartbeat) {
+    txHeartbeat = setInterval(() => {
+      for (const c of txStreamClients) c.write(`:\n\n`) // comment ping
+    }, 15000).unref()
+  }
+}
+
+function removeTxStreamClient(raw) {
+  txStreamClients.delete(raw)
+  if (txStreamClients.size === 0 && txHeartbeat) { clearInterval(txHeartbeat); txHeartbeat = null }
+}
+
 app.get('/streams/tx', async (req, reply) => {
   reply
     .header('Content-Type', 'text/event-stream')
@@ -299,15 +448,30 @@ app.get('/streams/tx', async (req, reply) => {
     .code(200)
 
   const send = (obj) => reply.raw.write(`data: ${JSON.stringify(obj)}\n\n`)
-  const ping = () => reply.raw.write(`:\n\n`) // comment ping
 
   // Initial hello
   send({ tx_id: 'bootstrap', type: 'hello', actor_id: 'system', amount: 0, created_at: new Date().toISOString() })
 
-  const interval = setInterval(() => ping(), 15000)
-  req.raw.on('close', () => clearInterval(interval))
+  addTxStreamClient(reply.raw)
+  req.raw.on('close', () => removeTxStreamClient(reply.raw))
 })
 
+// Stop accepting requests, let in-flight transactions finish, then release the DB pool so a
+// redeploy never cuts a wallet write off mid-transaction.
+async function shutdown(signal) {
+  app.log.info(`${signal} received, shutting down`)
+  for (const raw of txStreamClients) raw.end()
+  try {
+    await app.close()
+    await prisma.$disconnect()
+  } catch (err) {
+    app.log.error(err)
+  }
+  process.exit(0)
+}
+process.once('SIGTERM', shutdown)
+process.once('SIGINT', shutdown)
+
 app.listen({ host: '0.0.0.0', port: PORT })
   .then(() => app.log.info(`API listening on :${PORT}`))
   .catch((err) => { app.log.error(err); process.exit(1) })
@@ -1,4 +1,4 @@
-import { Client, GatewayIntentBits, Partials, Events, REST, Routes, SlashCommandBuilder, EmbedBuilder, ActionRowBuilder, ButtonBuilder, ButtonStyle, PermissionsBitField, ChannelType } from 'discord.js'
+import { Client, GatewayIntentBits, Partials, Events, Routes, SlashCommandBuilder, EmbedBuilder, ActionRowBuilder, ButtonBuilder, ButtonStyle, PermissionsBitField, ChannelType } from 'discord.js'
 
 const token = process.env.DISCORD_TOKEN
 const guildId = process.env.GUILD_ID
@@ -12,38 +12,43 @@ if (!token) {
 }
 
 const client = new Client({
+  // No message handlers: subscribing to GuildMessages/MessageContent would only make the
+  // gateway deliver (and discord.js decode and cache) every chat message for nothing.
   intents: [
     GatewayIntentBits.Guilds,
     GatewayIntentBits.GuildMembers,
-    GatewayIntentBits.GuildMessages,
-    GatewayIntentBits.MessageContent,
   ],
   partials: [Partials.Channel],
 })
 
-client.once(Events.ClientReady, async () => {
-  console.log(`Bot logged in as ${client.user.tag}`)
+// Slash command definitions are static, so they are serialized once at load. Registration is a
+// single bulk overwrite for the one configured guild.
+const COMMANDS = [
+  new SlashCommandBuilder().setName('ping').setDescription('Check bot latency'),
+  new SlashCommandBuilder().setName('card').setDescription('Show your wallet card'),
+  new SlashCommandBuilder().setName('claim').setDescription('Claim your daily coins'),
+  new SlashCommandBuilder().setName('setup_economy').setDescription('Create Coin Economy category & channels').setDefaultMemberPermissions(PermissionsBitField.Flags.ManageGuild),
+  new SlashCommandBuilder().setName('seed_market').setDescription('Seed marketplace with starter listings').setDefaultMemberPermissions(PermissionsBitField.Flags.ManageGuild),
+  new SlashCommandBuilder().setName('leaderboard_refresh').setDescription('Refresh the leaderboard message').setDefaultMemberPermissions(PermissionsBitField.Flags.ManageGuild),
+  new SlashCommandBuilder().setName('milestones_channel').setDescription('Set channel for coin milestone messages').setDefaultMemberPermissions(PermissionsBitField.Flags.ManageGuild).addChannelOption(o=>o.setName('channel').setDescription('Channel').setRequired(true)),
+].map(c => c.toJSON())
+
+async function registerCommands() {
   // Register commands (guild-scoped for fast updates)
-  if (clientId && guildId) {
-    try {
-      const commands = [
-        new SlashCommandBuilder().setName('ping').setDescription('Check bot latency'),
-        new SlashCommandBuilder().setName('card').setDescription('Show your wallet card'),
-        new SlashCommandBuilder().setName('claim').setDescription('Claim your daily coins'),
-        new SlashCommandBuilder().setName('setup_economy').setDescription('Create Coin Economy category & channels'),
-        new SlashCommandBuilder().setName('seed_market').setDescription('Seed marketplace with starter listings'),
-        new SlashCommandBuilder().setName('leaderboard_refresh').setDescription('Refresh the leaderboard message'),
-        new SlashCommandBuilder().setName('milestones_channel').setDescription('Set channel for coin milestone messages').addChannelOption(o=>o.setName('channel').setDescription('Channel').setRequired(true)),
-      ].map(c => c.toJSON())
-      const rest = new REST({ version: '10' }).setToken(token)
-      await rest.put(Routes.applicationGuildCommands(clientId, guildId), { body: commands })
-      console.log('Registered slash commands')
-    } catch (e) {
-      console.log('Failed to register commands:', e?.message || e)
-    }
-  } else {
+  if (!clientId || !guildId) {
     console.log('DISCORD_CLIENT_ID or GUILD_ID not set; skipping command registration')
+    return
   }
+  try {
+    // The client already owns an authenticated REST manager (and its rate-limit state).
+    await client.rest.put(Routes.applicationGuildCommands(clientId, guildId), { body: COMMANDS })
+    console.log('Registered slash commands')
+  } catch (e) {
+    console.log('Failed to register commands:', e?.message || e)
+  }
+}
+
+async function announceOnline() {
   try {
     let channel = null
     if (mainChannelId) {
@@ -63,14 +68,28 @@ client.once(Events.ClientReady, async () => {
   } catch (e) {
     console.log('Unable to post online status:', e?.message || e)
   }
+}
+
+client.once(Events.ClientReady, async () => {
+  console.log(`Bot logged in as ${client.user.tag}`)
+  // Independent startup calls; neither waits on the other's round-trips.
+  await Promise.all([registerCommands(), announceOnline()])
 })
 
+// Guild config is read on most interactions but only changes through saveConfig or the panel,
+// so keep a short-lived copy instead of calling the API every time.
+const CONFIG_TTL_MS = 60 * 1000
+let configCache = null
+
 async function getConfig() {
   if (!guildId) return null
+  if (configCache && Date.now() - configCache.at < CONFIG_TTL_MS) return configCache.value
   try {
     const res = await fetch(`${apiBase}/config/${guildId}`)
-    if (res.ok) return await res.json()
-    return null
+    if (!res.ok) return null
+    const value = await res.json()
+    configCache = { value, at: Date.now() }
+    return value
   } catch { return null }
 }
 
@@ -81,7 +100,9 @@ async function saveConfig(partial) {
       method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(partial)
     })
     if (!res.ok) return null
-    return await res.json()
+    const value = await res.json()
+    configCache = { value, at: Date.now() }
+    return value
   } catch {
     return null
   }
@@ -101,20 +122,23 @@ async function ensureEconomyChannels(interaction) {
     { id: everyone.id, deny: [PermissionsBitField.Flags.SendMessages], allow: [PermissionsBitField.Flags.ViewChannel, PermissionsBitField.Flags.ReadMessageHistory] },
     { id: me.id, allow: [PermissionsBitField.Flags.ViewChannel, PermissionsBitField.Flags.SendMessages, PermissionsBitField.Flags.EmbedLinks, PermissionsBitField.Flags.ManageMessages] }
   ]
-  async function createOrFind(name, extraOverwrites = []) {
-    let ch = category.children?.cache?.find?.(c => c.name === name) || guild.channels.cache.find(c => c.parentId === category.id && c.name === name)
-    if (!ch) ch = await guild.channels.create({ name, type: ChannelType.GuildText, parent: category.id, permissionOverwrites: [...baseOverwrites, ...extraOverwrites] })
-    return ch
-  }
-  const hub = await createOrFind('coin-hub')
-  const shop = await createOrFind('shop')
-  const leaderboard = await createOrFind('leaderboard')
-  const quests = await createOrFind('quests')
-  const announcements = await createOrFind('coin-announcements', [
-    // Admins can customize perms later
-  ])
-  const transactions = await createOrFind('coin-transactions', [
-    { id: everyone.id, deny: [PermissionsBitField.Flags.ViewChannel, PermissionsBitField.Flags.SendMessages] },
+  // Index the category's channels by name once rather than scanning the guild cache per channel.
+  const existing = new Map(guild.channels.cache.filter(c => c.parentId === category.id).map(c => [c.name, c]))
+  const createOrFind = (name, position, extraOverwrites = []) => existing.get(name)
+    ?? guild.channels.create({ name, type: ChannelType.GuildText, parent: category.id, permissionOverwrites: [...baseOverwrites, ...extraOverwrites], position })
+  // The channels are independent, so create them concurrently; explicit positions keep their
+  // order in the category regardless of which request lands first.
+  const [hub, shop, leaderboard, quests, announcements, transactions] = await Promise.all([
+    createOrFind('coin-hub', 0),
+    createOrFind('shop', 1),
+    createOrFind('leaderboard', 2),
+    createOrFind('quests', 3),
+    createOrFind('coin-announcements', 4, [
+      // Admins can customize perms later
+    ]),
+    createOrFind('coin-transactions', 5, [
+      { id: everyone.id, deny: [PermissionsBitField.Flags.ViewChannel, PermissionsBitField.Flags.SendMessages] },
+    ]),
   ])
   await saveConfig({
     guildId,
@@ -137,46 +161,183 @@ async function ensureEconomyChannels(interaction) {
   return { category, hub, shop, leaderboard, quests, announcements, transactions }
 }
 
+// Static components/embeds never change, so they are built once and reused for every reply.
+const HUB_ROW = new ActionRowBuilder().addComponents(
+  new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('My Card'),
+  new ButtonBuilder().setCustomId('hub:shop').setStyle(ButtonStyle.Secondary).setLabel('Shop'),
+  new ButtonBuilder().setCustomId('hub:quests').setStyle(ButtonStyle.Secondary).setLabel('Quests'),
+  new ButtonBuilder().setCustomId('hub:claim').setStyle(ButtonStyle.Success).setLabel('Claim Daily'),
+  new ButtonBuilder().setCustomId('hub:help').setStyle(ButtonStyle.Secondary).setLabel('Help'),
+)
+const HELP_ROW = new ActionRowBuilder().addComponents(
+  new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('My Card'),
+  new ButtonBuilder().setCustomId('hub:shop').setStyle(ButtonStyle.Secondary).setLabel('Shop'),
+  new ButtonBuilder().setCustomId('hub:quests').setStyle(ButtonStyle.Secondary).setLabel('Quests'),
+  new ButtonBuilder().setCustomId('hub:claim').setStyle(ButtonStyle.Success).setLabel('Claim Daily'),
+)
+const VIEW_CARD_ROW = new ActionRowBuilder().addComponents(
+  new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('View Card'),
+)
+const SHOP_BUY_PREFIX = 'shop:buy:'
+
+const HELP_EMBED = new EmbedBuilder()
+  .setTitle('How the Economy Works')
+  .setDescription('Earn coins by claiming daily rewards, completing quests and trading with others.')
+  .addFields(
+    { name: 'Daily Claim', value: 'Use **Claim Daily** once every 24h for free coins.' },
+    { name: 'Quests', value: 'Visit the quests channel for extra rewards.' },
+    { name: 'Shop', value: 'Buy or sell items anonymously in the marketplace.' },
+    { name: 'Trades', value: 'All purchases are handled privately via DM.' },
+  )
+  .setColor(0x3b82f6)
+
+function buildCardEmbed(user, wallet) {
+  return new EmbedBuilder()
+    .setTitle('Your Card')
+    .setDescription('Wallet summary')
+    .addFields(
+      { name: 'Balance', value: String(wallet.wallet_balance), inline: true },
+      { name: 'Escrow', value: String(wallet.escrow_balance), inline: true },
+    )
+    .setThumbnail(user.displayAvatarURL())
+    .setColor(0x0ea5e9)
+    .setFooter({ text: 'Legocraft Economy' })
+}
+
 function buildHubMessage() {
   const embed = new EmbedBuilder().setTitle('Coin Hub').setDescription('Welcome to the Legocraft economy! Use the buttons below.').setColor(0x0ea5e9)
-  const row = new ActionRowBuilder().addComponents(
-    new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('My Card'),
-    new ButtonBuilder().setCustomId('hub:shop').setStyle(ButtonStyle.Secondary).setLabel('Shop'),
-    new ButtonBuilder().setCustomId('hub:quests').setStyle(ButtonStyle.Secondary).setLabel('Quests'),
-    new ButtonBuilder().setCustomId('hub:claim').setStyle(ButtonStyle.Success).setLabel('Claim Daily'),
-    new ButtonBuilder().setCustomId('hub:help').setStyle(ButtonStyle.Secondary).setLabel('Help'),
-  )
-  return { embeds: [embed], components: [row] }
+  return { embeds: [embed], components: [HUB_ROW] }
 }
 
-async function buildQuestsMessage() {
-  const res = await fetch(`${apiBase}/quests/${guildId}`).then(r=>r.json()).catch(()=>null)
+// Rendered quest embeds per guild; quests change rarely, so hub presses within the TTL reuse them.
+const QUESTS_TTL_MS = 60 * 1000
+const MAX_EMBED_FIELDS = 25
+const questsCache = new Map()
+
+async function getQuestsEmbed(gid) {
+  const hit = questsCache.get(gid)
+  if (hit && Date.now() - hit.at < QUESTS_TTL_MS) return hit.embed
+  const res = await fetch(`${apiBase}/quests/${gid}`).then(r=>r.json()).catch(()=>null)
   if (!Array.isArray(res)) return null
   const embed = new EmbedBuilder().setTitle('Quests').setColor(0xf59e0b)
   if (res.length === 0) embed.setDescription('No quests available.')
-  else for (const q of res) embed.addFields({ name: q.title, value: `${q.reward} coins` })
-  return { embeds: [embed] }
+  else embed.addFields(res.slice(0, MAX_EMBED_FIELDS).map(q => ({ name: q.title, value: `${q.reward} coins` })))
+  if (res.length > MAX_EMBED_FIELDS) embed.setFooter({ text: `Showing ${MAX_EMBED_FIELDS} of ${res.length} quests` })
+  questsCache.set(gid, { embed, at: Date.now() })
+  return embed
 }
 
-async function postTxEmbed(type, fields = [], opts = {}) {
+// Rendered shop page; every hub Shop press within the TTL reuses it. Purchases and seeding
+// change the listings, so they drop it immediately instead of waiting out the TTL; a fetch that
+// overlapped one of them (the version moved) is not cached.
+const SHOP_TTL_MS = 30 * 1000
+const SHOP_EMBED = new EmbedBuilder().setTitle('Marketplace').setDescription('Click to buy 1 unit.').setColor(0x22c55e)
+let shopCache = null
+let listingsVersion = 0
+
+function listingsChanged() {
+  listingsVersion++
+  shopCache = null
+}
+
+async function getShopMessage() {
+  if (shopCache && Date.now() - shopCache.at < SHOP_TTL_MS) return shopCache.message
+  const version = listingsVersion
+  const data = await fetch(`${apiBase}/listings?limit=10`).then(r => r.ok ? r.json() : null).catch(()=>null)
+  if (!Array.isArray(data?.items)) return null
+  const items = data.items.slice(0, 10)
+  const message = items.length === 0
+    ? { content: 'No listings yet. Use Seed or Sell Item.' }
+    : { embeds: [SHOP_EMBED], components: items.map(item => new ActionRowBuilder().addComponents(
+        new ButtonBuilder().setCustomId(`${SHOP_BUY_PREFIX}${item.id}`).setStyle(ButtonStyle.Success).setLabel(`Buy 1 — ${item.price}`),
+      )) }
+  if (version === listingsVersion) shopCache = { message, at: Date.now() }
+  return message
+}
+
+// One pinned leaderboard message per guild, edited in place. Refreshes requested while one is
+// already running share its result instead of each fetching and posting again.
+let leaderboardRefresh = null
+
+function refreshLeaderboard() {
+  if (!leaderboardRefresh) leaderboardRefresh = updateLeaderboardPanel().finally(() => { leaderboardRefresh = null })
+  return leaderboardRefresh
+}
+
+async function updateLeaderboardPanel() {
   const cfg = await getConfig()
-  if (cfg?.transactionsChannelId) {
-    const ch = await client.channels.fetch(cfg.transactionsChannelId).catch(() => null)
-    if (ch?.isTextBased()) {
-      const embed = new EmbedBuilder().setTitle(`TX: ${type}`).setColor(type === 'earn' ? 0x22c55e : 0xef4444).addFields(fields)
-      ch.send({ embeds: [embed] }).catch(()=>{})
-    }
+  if (!cfg?.leaderboardChannelId) return 'No leaderboard channel configured. Run /setup_economy first.'
+  const res = await fetch(`${apiBase}/leaderboard?limit=10`).then(r => r.ok ? r.json() : null).catch(()=>null)
+  if (!Array.isArray(res?.items)) return 'Failed to fetch leaderboard'
+  const lines = res.items.map((u,i)=>`#${i+1} <@${u.discord_id}> — ${u.wallet_balance}`).join('\n') || 'No data.'
+  const ch = await client.channels.fetch(cfg.leaderboardChannelId).catch(()=>null)
+  if (!ch?.isTextBased()) return 'Leaderboard channel not found.'
+  const payload = { embeds: [ new EmbedBuilder().setTitle('Top 10 Balances').setDescription(lines).setColor(0xf59e0b) ] }
+  const pinned = (await ch.messages.fetchPinned().catch(()=>null))?.find(m => m.author.id === client.user.id)
+  if (pinned) {
+    await pinned.edit(payload)
+  } else {
+    const msg = await ch.send(payload)
+    await msg.pin().catch(()=>{})
+  }
+  return 'Leaderboard refreshed.'
+}
+
+async function buildQuestsMessage() {
+  const embed = await getQuestsEmbed(guildId)
+  return embed ? { embeds: [embed] } : null
+}
+
+// Interactions that were already deferred/answered must be edited; a second reply() throws.
+function replyEphemeral(interaction, content) {
+  if (interaction.deferred || interaction.replied) return interaction.editReply({ content })
+  return interaction.reply({ ephemeral: true, content })
+}
+
+// Transaction feed embeds are queued and flushed in batches (up to 10 embeds per message)
+// so bursts of claims/purchases cost one channel write per interval instead of one each.
+const TX_FLUSH_MS = 5000
+const txQueue = []
+let txFlushTimer = null
+
+function queueTxEmbed(embed) {
+  txQueue.push(embed)
+  if (!txFlushTimer) txFlushTimer = setTimeout(flushTxEmbeds, TX_FLUSH_MS)
+}
+
+async function flushTxEmbeds() {
+  if (txFlushTimer) { clearTimeout(txFlushTimer); txFlushTimer = null }
+  if (txQueue.length === 0) return
+  const batch = txQueue.splice(0)
+  const cfg = await getConfig()
+  if (!cfg?.transactionsChannelId) return
+  const ch = await client.channels.fetch(cfg.transactionsChannelId).catch(() => null)
+  if (!ch?.isTextBased()) return
+  for (let i = 0; i < batch.length; i += 10) {
+    await ch.send({ embeds: batch.slice(i, i + 10) }).catch(()=>{})
   }
-  if (type === 'earn' && opts.userId && typeof opts.balance === 'number' && cfg?.milestoneChannelId) {
-    if (opts.balance % 10 === 0) {
+}
+
+async function postTxEmbed(type, fields = [], opts = {}) {
+  queueTxEmbed(new EmbedBuilder().setTitle(`TX: ${type}`).setColor(type === 'earn' ? 0x22c55e : 0xef4444).addFields(fields))
+  if (type === 'earn' && opts.userId && typeof opts.balance === 'number' && opts.balance % 10 === 0) {
+    const cfg = await getConfig()
+    if (cfg?.milestoneChannelId) {
       const mch = await client.channels.fetch(cfg.milestoneChannelId).catch(()=>null)
       if (mch?.isTextBased()) mch.send(`<@${opts.userId}> reached ${opts.balance} coins!`).catch(()=>{})
     }
   }
 }
-client.on(Events.InteractionCreate, async (interaction) => {
-  if (!interaction.isChatInputCommand()) return
+
+// Admin commands always require Manage Server. Their default member permissions only decide who
+// sees them; re-granting one to a role under Integrations does not bypass this check.
+const ADMIN_COMMANDS = new Set(COMMANDS.filter(c => c.default_member_permissions != null).map(c => c.name))
+
+async function handleSlashCommand(interaction) {
   try {
+  if (ADMIN_COMMANDS.has(interaction.commandName) && !interaction.memberPermissions?.has(PermissionsBitField.Flags.ManageGuild)) {
+    return await interaction.reply({ content: 'No permission.', ephemeral: true })
+  }
   if (interaction.commandName === 'ping') {
     const t = Date.now()
     await interaction.reply({ content: 'Pong!', ephemeral: true })
@@ -187,14 +348,7 @@ client.on(Events.InteractionCreate, async (interaction) => {
     await interaction.deferReply({ ephemeral: true })
     const res = await fetch(`${apiBase}/wallet/${interaction.user.id}`).then(r => r.json()).catch(() => null)
     if (!res || res.error) return interaction.editReply('Could not fetch wallet')
-    const embed = new EmbedBuilder()
-      .setTitle('Your Card')
-      .addFields(
-        { name: 'Balance', value: String(res.wallet_balance), inline: true },
-        { name: 'Escrow', value: String(res.escrow_balance), inline: true },
-      )
-      .setFooter({ text: 'Legocraft Economy' })
-    return interaction.editReply({ embeds: [embed] })
+    return interaction.editReply({ embeds: [buildCardEmbed(interaction.user, res)] })
   }
   if (interaction.commandName === 'claim') {
     await interaction.deferReply({ ephemeral: true })
@@ -222,25 +376,23 @@ client.on(Events.InteractionCreate, async (interaction) => {
       { title: 'Duck Hat Cosmetic', price: 500 },
       { title: 'Mystery Box (Basic)', price: 250 },
     ]
-    let ok = 0
-    for (const s of seeds) {
-      try { await fetch(`${apiBase}/listings`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ title: s.title, price: s.price }) }) ; ok++ } catch {}
-    }
+    const post = (s) => fetch(`${apiBase}/listings`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ title: s.title, price: s.price }) })
+    // The first post creates the shared system seller on a fresh database; the rest can then run
+    // concurrently without racing on that user's unique discordId.
+    const [first, ...rest] = seeds
+    const results = [
+      ...(await Promise.allSettled([post(first)])),
+      ...(await Promise.allSettled(rest.map(post))),
+    ]
+    const ok = results.filter(r => r.status === 'fulfilled' && r.value.ok).length
+    listingsChanged()
     await interaction.editReply(`Seeded ${ok}/${seeds.length} listings.`)
     await postTxEmbed('list', [ { name: 'Seed', value: `${ok} listings created` }])
     return
   }
   if (interaction.commandName === 'leaderboard_refresh') {
     await interaction.deferReply({ ephemeral: true })
-    const cfg = await getConfig()
-    if (!cfg?.leaderboardChannelId) return interaction.editReply('No leaderboard channel configured. Run /setup_economy first.')
-    const res = await fetch(`${apiBase}/users`).then(r => r.json()).catch(()=>null)
-    if (!res) return interaction.editReply('Failed to fetch users')
-    const top = (res.items || []).sort((a,b)=>b.wallet_balance - a.wallet_balance).slice(0,10)
-    const lines = top.map((u,i)=>`#${i+1} <@${u.discord_id}> — ${u.wallet_balance}`).join('\n') || 'No data.'
-    const ch = await client.channels.fetch(cfg.leaderboardChannelId).catch(()=>null)
-    if (ch?.isTextBased()) await ch.send({ embeds: [ new EmbedBuilder().setTitle('Top 10 Balances').setDescription(lines).setColor(0xf59e0b) ] })
-    await interaction.editReply('Leaderboard refreshed.')
+    await interaction.editReply(await refreshLeaderboard())
     return
   }
   if (interaction.commandName === 'milestones_channel') {
@@ -250,109 +402,92 @@ client.on(Events.InteractionCreate, async (interaction) => {
     return
   }
   } catch (e) {
-    try { await interaction.reply({ ephemeral: true, content: 'Something went wrong processing your command.' }) } catch {}
+    await replyEphemeral(interaction, 'Something went wrong processing your command.').catch(()=>{})
   }
-})
+}
 
-client.on(Events.InteractionCreate, async (interaction) => {
-  if (!interaction.isButton()) return
-  try {
-    if (interaction.customId === 'hub:help') {
-      const embed = new EmbedBuilder()
-        .setTitle('How the Economy Works')
-        .setDescription('Earn coins by claiming daily rewards, completing quests and trading with others.')
-        .addFields(
-          { name: 'Daily Claim', value: 'Use **Claim Daily** once every 24h for free coins.' },
-          { name: 'Quests', value: 'Visit the quests channel for extra rewards.' },
-          { name: 'Shop', value: 'Buy or sell items anonymously in the marketplace.' },
-          { name: 'Trades', value: 'All purchases are handled privately via DM.' },
-        )
-        .setColor(0x3b82f6)
-      const row = new ActionRowBuilder().addComponents(
-        new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('My Card'),
-        new ButtonBuilder().setCustomId('hub:shop').setStyle(ButtonStyle.Secondary).setLabel('Shop'),
-        new ButtonBuilder().setCustomId('hub:quests').setStyle(ButtonStyle.Secondary).setLabel('Quests'),
-        new ButtonBuilder().setCustomId('hub:claim').setStyle(ButtonStyle.Success).setLabel('Claim Daily'),
-      )
-      return interaction.reply({ ephemeral: true, embeds: [embed], components: [row] })
-    }
-    if (interaction.customId === 'hub:card') {
-      const res = await fetch(`${apiBase}/wallet/${interaction.user.id}`).then(r=>r.json()).catch(()=>null)
-      if (!res || res.error) return interaction.reply({ ephemeral: true, content: 'Could not load wallet.' })
-      const embed = new EmbedBuilder()
-        .setTitle('Your Card')
-        .setDescription('Wallet summary')
-        .addFields(
-          { name: 'Balance', value: String(res.wallet_balance), inline: true },
-          { name: 'Escrow', value: String(res.escrow_balance), inline: true },
-        )
-        .setThumbnail(interaction.user.displayAvatarURL())
-        .setColor(0x0ea5e9)
-      return interaction.reply({ ephemeral: true, embeds: [embed] })
-    }
-    if (interaction.customId === 'hub:quests') {
-      const data = await fetch(`${apiBase}/quests/${interaction.guildId}`).then(r=>r.json()).catch(()=>null)
-      const embed = new EmbedBuilder().setTitle('Quests').setColor(0xf59e0b)
-      if (Array.isArray(data) && data.length) {
-        for (const q of data) embed.addFields({ name: q.title, value: `${q.reward} coins` })
-      } else {
-        embed.setDescription('No quests available.')
-      }
-      return interaction.reply({ ephemeral: true, embeds: [embed] })
-    }
-    if (interaction.customId === 'hub:claim') {
-      const res = await fetch(`${apiBase}/wallet/claim`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ discord_id: interaction.user.id, username: interaction.user.username }) }).then(r => r.json()).catch(()=>null)
-      if (!res) return interaction.reply({ ephemeral: true, content: 'Error contacting API.' })
-      if (res.error === 'cooldown') return interaction.reply({ ephemeral: true, content: `Already claimed. Next at ${res.next_at}` })
-      if (res.ok) {
-        await postTxEmbed('earn', [ { name: 'User', value: `<@${interaction.user.id}>` }, { name: 'Reason', value: 'daily_claim' }, { name: 'Amount', value: String(res.amount) } ], { userId: interaction.user.id, balance: res.balance })
-        const embed = new EmbedBuilder()
-          .setTitle('Daily Reward')
-          .setDescription(`You received **${res.amount}** coins!`)
-          .setColor(0x22c55e)
-        const row = new ActionRowBuilder().addComponents(
-          new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('View Card'),
-        )
-        return interaction.reply({ ephemeral: true, embeds: [embed], components: [row] })
-      }
-      return interaction.reply({ ephemeral: true, content: 'Could not claim now.' })
-    }
-    if (interaction.customId === 'hub:shop') {
-      const data = await fetch(`${apiBase}/listings`).then(r=>r.json()).catch(()=>null)
-      if (!data) return interaction.reply({ ephemeral: true, content: 'Failed to load listings.' })
-      const items = (data.items || []).slice(0, 10)
-      if (items.length === 0) return interaction.reply({ ephemeral: true, content: 'No listings yet. Use Seed or Sell Item.' })
-      const rows = []
-      for (const item of items) {
-        const row = new ActionRowBuilder().addComponents(
-          new ButtonBuilder().setCustomId(`shop:buy:${item.id}`).setStyle(ButtonStyle.Success).setLabel(`Buy 1 — ${item.price}`),
-        )
-        rows.push(row)
-      }
-      const embed = new EmbedBuilder().setTitle('Marketplace').setDescription('Click to buy 1 unit.').setColor(0x22c55e)
-      return interaction.reply({ ephemeral: true, embeds: [embed], components: rows })
-    }
-    if (interaction.customId.startsWith('shop:buy:')) {
-      const listingId = interaction.customId.split(':')[2]
-      const res = await fetch(`${apiBase}/orders`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ listing_id: Number(listingId), qty: 1, buyer_discord_id: interaction.user.id, username: interaction.user.username }) }).then(r=>r.json()).catch(()=>null)
-      if (!res) return interaction.reply({ ephemeral: true, content: 'Error contacting API.' })
-      if (res.error) return interaction.reply({ ephemeral: true, content: `Purchase failed: ${res.error}` })
-      await postTxEmbed('buy', [ { name: 'Buyer', value: `<@${interaction.user.id}>` }, { name: 'Order', value: String(res.order_id) }, { name: 'Total', value: String(res.total) } ])
+const buttonHandlers = {
+  'hub:help': async (interaction) => {
+    return interaction.reply({ ephemeral: true, embeds: [HELP_EMBED], components: [HELP_ROW] })
+  },
+  'hub:card': async (interaction) => {
+    await interaction.deferReply({ ephemeral: true })
+    const res = await fetch(`${apiBase}/wallet/${interaction.user.id}`).then(r=>r.json()).catch(()=>null)
+    if (!res || res.error) return interaction.editReply({ content: 'Could not load wallet.' })
+    return interaction.editReply({ embeds: [buildCardEmbed(interaction.user, res)] })
+  },
+  'hub:quests': async (interaction) => {
+    await interaction.deferReply({ ephemeral: true })
+    const embed = await getQuestsEmbed(interaction.guildId)
+      ?? new EmbedBuilder().setTitle('Quests').setColor(0xf59e0b).setDescription('No quests available.')
+    return interaction.editReply({ embeds: [embed] })
+  },
+  'hub:claim': async (interaction) => {
+    await interaction.deferReply({ ephemeral: true })
+    const res = await fetch(`${apiBase}/wallet/claim`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ discord_id: interaction.user.id, username: interaction.user.username }) }).then(r => r.json()).catch(()=>null)
+    if (!res) return interaction.editReply({ content: 'Error contacting API.' })
+    if (res.error === 'cooldown') return interaction.editReply({ content: `Already claimed. Next at ${res.next_at}` })
+    if (res.ok) {
+      await postTxEmbed('earn', [ { name: 'User', value: `<@${interaction.user.id}>` }, { name: 'Reason', value: 'daily_claim' }, { name: 'Amount', value: String(res.amount) } ], { userId: interaction.user.id, balance: res.balance })
       const embed = new EmbedBuilder()
-        .setTitle('Purchase Complete')
-        .addFields(
-          { name: 'Order', value: `#${res.order_id}`, inline: true },
-          { name: 'Total', value: String(res.total), inline: true },
-        )
+        .setTitle('Daily Reward')
+        .setDescription(`You received **${res.amount}** coins!`)
         .setColor(0x22c55e)
-      const row = new ActionRowBuilder().addComponents(
-        new ButtonBuilder().setCustomId('hub:card').setStyle(ButtonStyle.Primary).setLabel('View Card'),
-      )
-      return interaction.reply({ ephemeral: true, embeds: [embed], components: [row] })
+      return interaction.editReply({ embeds: [embed], components: [VIEW_CARD_ROW] })
     }
+    return interaction.editReply({ content: 'Could not claim now.' })
+  },
+  'hub:shop': async (interaction) => {
+    await interaction.deferReply({ ephemeral: true })
+    const message = await getShopMessage()
+    if (!message) return interaction.editReply({ content: 'Failed to load listings.' })
+    return interaction.editReply(message)
+  },
+}
+
+async function handleShopBuy(interaction) {
+  await interaction.deferReply({ ephemeral: true })
+  const listingId = Number(interaction.customId.slice(SHOP_BUY_PREFIX.length))
+  const res = await fetch(`${apiBase}/orders`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ listing_id: listingId, qty: 1, buyer_discord_id: interaction.user.id, username: interaction.user.username }) }).then(r=>r.json()).catch(()=>null)
+  if (!res) return interaction.editReply({ content: 'Error contacting API.' })
+  listingsChanged() // even a failed order may mean the page showed a listing that is gone
+  if (res.error) return interaction.editReply({ content: `Purchase failed: ${res.error}` })
+  await postTxEmbed('buy', [ { name: 'Buyer', value: `<@${interaction.user.id}>` }, { name: 'Order', value: String(res.order_id) }, { name: 'Total', value: String(res.total) } ])
+  const embed = new EmbedBuilder()
+    .setTitle('Purchase Complete')
+    .addFields(
+      { name: 'Order', value: `#${res.order_id}`, inline: true },
+      { name: 'Total', value: String(res.total), inline: true },
+    )
+    .setColor(0x22c55e)
+  return interaction.editReply({ embeds: [embed], components: [VIEW_CARD_ROW] })
+}
+
+async function handleButton(interaction) {
+  const id = interaction.customId
+  const handler = Object.hasOwn(buttonHandlers, id) ? buttonHandlers[id]
+    : id.startsWith(SHOP_BUY_PREFIX) ? handleShopBuy : null
+  if (!handler) return
+  try {
+    return await handler(interaction)
   } catch (e) {
-    return interaction.reply({ ephemeral: true, content: 'Something went wrong.' }).catch(()=>{})
+    return replyEphemeral(interaction, 'Something went wrong.').catch(()=>{})
   }
+}
+
+// A single listener, so each interaction is classified once instead of waking one async
+// handler per interaction kind (autocomplete, modals, etc. are dropped straight away).
+client.on(Events.InteractionCreate, (interaction) => {
+  if (interaction.isChatInputCommand()) return handleSlashCommand(interaction)
+  if (interaction.isButton()) return handleButton(interaction)
 })
 
+async function shutdown() {
+  await flushTxEmbeds().catch(()=>{})
+  await client.destroy()
+  process.exit(0)
+}
+process.once('SIGTERM', shutdown)
+process.once('SIGINT', shutdown)
+
 client.login(token)
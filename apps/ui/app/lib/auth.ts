@@ -17,7 +17,7 @@ export const authOptions: AuthOptions = {
         const guildId = process.env.GUILD_ID!
         const botToken = process.env.DISCORD_TOKEN!
         if (!guildId || !botToken) return false
-        const member = await fetchGuildMember({ userId: user.id as string, guildId, botToken })
+        const member = await fetchGuildMember({ userId: user.id as string, guildId, botToken, fresh: true })
         return !!member
       } catch {
         return false
@@ -1,11 +1,26 @@
 const DISCORD_API = 'https://discord.com/api'
 
-export async function fetchGuildMember(opts: { userId: string, guildId: string, botToken: string }) {
+type GuildMember = { user: { id: string }, roles: string[] }
+
+// The session callback runs on every authenticated request; keep members briefly so
+// page loads don't each cost a Discord API call (and eat into its rate limit).
+// Sign-in passes `fresh` to always ask Discord, and non-members are never cached.
+const MEMBER_TTL_MS = 60 * 1000
+const MEMBER_CACHE_MAX = 1000
+const memberCache = new Map<string, { at: number, member: GuildMember }>()
+
+export async function fetchGuildMember(opts: { userId: string, guildId: string, botToken: string, fresh?: boolean }) {
+  const key = `${opts.guildId}:${opts.userId}`
+  const hit = opts.fresh ? undefined : memberCache.get(key)
+  if (hit && Date.now() - hit.at < MEMBER_TTL_MS) return hit.member
   const res = await fetch(`${DISCORD_API}/guilds/${opts.guildId}/members/${opts.userId}`, {
     headers: { Authorization: `Bot ${opts.botToken}` },
   })
+  memberCache.delete(key)
   if (res.status === 404) return null
   if (!res.ok) throw new Error(`Discord API error ${res.status}`)
-  return await res.json() as { user: { id: string }, roles: string[] }
+  const member = await res.json() as GuildMember
+  if (memberCache.size >= MEMBER_CACHE_MAX) memberCache.delete(memberCache.keys().next().value!)
+  memberCache.set(key, { at: Date.now(), member })
+  return member
 }
-
@@ -1,19 +1,22 @@
 export type AppRole = 'SUPERADMIN' | 'ADMIN' | 'OPERATOR' | 'SUPPORT' | 'AUDITOR'
 
-function parseCsv(ids?: string) { return (ids || '').split(',').map(s => s.trim()).filter(Boolean) }
+// Pulls every snowflake out in one pass, so spacing and pasted `<@&id>` mentions are tolerated.
+function parseCsv(ids?: string) { return new Set((ids || '').match(/\d+/g) ?? []) }
 
-export function mapDiscordRolesToAppRole(discordRoleIds: string[]): AppRole | null {
-  const sup = parseCsv(process.env.DISCORD_SUPERADMIN_ROLE_IDS)
-  const adm = parseCsv(process.env.DISCORD_ADMIN_ROLE_IDS)
-  const op = parseCsv(process.env.DISCORD_OPERATOR_ROLE_IDS)
-  const suppt = parseCsv(process.env.DISCORD_SUPPORT_ROLE_IDS)
-  const aud = parseCsv(process.env.DISCORD_AUDITOR_ROLE_IDS)
+// Role mappings come from the environment, which is fixed for the life of the process,
+// so they are parsed once rather than on every session callback. Ordered by precedence.
+const ROLE_TIERS: [AppRole, Set<string>][] = [
+  ['SUPERADMIN', parseCsv(process.env.DISCORD_SUPERADMIN_ROLE_IDS)],
+  ['ADMIN', parseCsv(process.env.DISCORD_ADMIN_ROLE_IDS)],
+  ['OPERATOR', parseCsv(process.env.DISCORD_OPERATOR_ROLE_IDS)],
+  ['SUPPORT', parseCsv(process.env.DISCORD_SUPPORT_ROLE_IDS)],
+  ['AUDITOR', parseCsv(process.env.DISCORD_AUDITOR_ROLE_IDS)],
+]
 
-  if (discordRoleIds.some(id => sup.includes(id))) return 'SUPERADMIN'
-  if (discordRoleIds.some(id => adm.includes(id))) return 'ADMIN'
-  if (discordRoleIds.some(id => op.includes(id))) return 'OPERATOR'
-  if (discordRoleIds.some(id => suppt.includes(id))) return 'SUPPORT'
-  if (discordRoleIds.some(id => aud.includes(id))) return 'AUDITOR'
+export function mapDiscordRolesToAppRole(discordRoleIds: string[]): AppRole | null {
+  for (const [role, ids] of ROLE_TIERS) {
+    if (discordRoleIds.some(id => ids.has(id))) return role
+  }
   return null
 }
 
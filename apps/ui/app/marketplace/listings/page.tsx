@@ -11,7 +11,7 @@ export default function ListingsPage() {
 
   const load = async () => {
     try {
-      const res = await fetch(`${apiBase}/listings`, { cache: 'no-store' })
+      const res = await fetch(`${apiBase}/listings?status=all`, { cache: 'no-store' })
       const data = await res.json()
       setItems(data.items || [])
     } catch {}
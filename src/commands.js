@@ -25,12 +25,13 @@ export async function handleSlash(db, client, interaction) {
     const shop = await guild.channels.create({ name: 'shop', reason: 'Coin shop' });
     const admin = await guild.channels.create({ name: 'coin-transactions', reason: 'Admin transaction feed' });
 
-    await setConfig(db, guild.id, {
+    const cfg = await setConfig(db, guild.id, {
       coin_hub_channel_id: hub.id,
       leaderboard_channel_id: lb.id,
       shop_channel_id: shop.id,
       admin_tx_channel_id: admin.id,
     });
+    configCache.set(guild.id, cfg);
 
     const hubMsg = await hub.send({ embeds: [hubEmbed()], components: [hubButtons()] });
     try { await hubMsg.pin(); } catch {}
@@ -40,7 +41,14 @@ export async function handleSlash(db, client, interaction) {
   }
 }
 
+// Guild config is read on every shop interaction but only written by /setupcoinsystem,
+// which refreshes this cache, so rows are loaded from SQLite once per guild.
+const configCache = new Map();
+
 export async function getGuildConfig(db, guildId) {
-  return await getConfig(db, guildId);
+  if (configCache.has(guildId)) return configCache.get(guildId);
+  const cfg = await getConfig(db, guildId);
+  if (cfg) configCache.set(guildId, cfg);
+  return cfg;
 }
 
@@ -3,10 +3,14 @@ import path from 'node:path';
 import fs from 'node:fs';
 
 export function openDb(filePath) {
-  const dir = path.dirname(filePath);
-  if (!fs.existsSync(dir)) fs.mkdirSync(dir, { recursive: true });
+  fs.mkdirSync(path.dirname(filePath), { recursive: true });
   const db = new sqlite3.Database(filePath);
   db.serialize(() => {
+    // WAL lets reads proceed during writes and turns each commit into a sequential log append;
+    // synchronous=FULL fsyncs the log on every commit, so balance writes survive power loss.
+    db.run('PRAGMA journal_mode = WAL');
+    db.run('PRAGMA synchronous = FULL');
+
     db.run(`CREATE TABLE IF NOT EXISTS config (
       guild_id TEXT PRIMARY KEY,
       coin_hub_channel_id TEXT,
@@ -75,14 +79,51 @@ export function openDb(filePath) {
   return db;
 }
 
+// Hot lookups reuse prepared statements (compiled once per connection) instead of
+// having SQLite re-parse the same SQL on every interaction.
+const statements = new WeakMap();
+
+function prepared(db, sql) {
+  let cache = statements.get(db);
+  if (!cache) {
+    cache = new Map();
+    statements.set(db, cache);
+  }
+  let stmt = cache.get(sql);
+  if (!stmt) {
+    stmt = db.prepare(sql);
+    cache.set(sql, stmt);
+  }
+  return stmt;
+}
+
+// Cached statements must be finalized first or sqlite refuses to close the handle; a clean
+// close also checkpoints the WAL back into the main database file.
+export function closeDb(db) {
+  const cache = statements.get(db);
+  if (cache) {
+    for (const stmt of cache.values()) stmt.finalize();
+    statements.delete(db);
+  }
+  return new Promise((resolve, reject) => {
+    db.close((err) => (err ? reject(err) : resolve()));
+  });
+}
+
+function getOne(db, sql, params, cb) {
+  const stmt = prepared(db, sql);
+  stmt.get(params, cb);
+  stmt.reset();
+}
+
 export function getUser(db, discordId) {
   return new Promise((resolve, reject) => {
-    db.get('SELECT * FROM users WHERE discord_id = ?', [discordId], (err, row) => {
+    getOne(db, 'SELECT * FROM users WHERE discord_id = ?', [discordId], (err, row) => {
       if (err) return reject(err);
       if (row) return resolve(row);
-      db.run('INSERT INTO users(discord_id) VALUES(?)', [discordId], (e) => {
+      prepared(db, 'INSERT INTO users(discord_id) VALUES(?)').run([discordId], (e) => {
         if (e) return reject(e);
-        db.get('SELECT * FROM users WHERE discord_id = ?', [discordId], (e2, r2) => {
+        getOne(db, 'SELECT * FROM users WHERE discord_id = ?', [discordId], (e2, r2) => {
           if (e2) return reject(e2);
           resolve(r2);
         });
@@ -113,26 +154,21 @@ export function getConfig(db, guildId) {
   });
 }
 
+const CONFIG_COLUMNS = ['coin_hub_channel_id','leaderboard_channel_id','shop_channel_id','admin_tx_channel_id','fee_rate','scarcity_threshold'];
+
+// Upserts only the columns present in `patch`; untouched columns keep their stored values
+// (or table defaults for a new row) and no read is needed beforehand.
 export function setConfig(db, guildId, patch) {
+  const cols = CONFIG_COLUMNS.filter((k) => patch[k] !== undefined);
+  const onConflict = cols.length ? `DO UPDATE SET ${cols.map((k) => `${k}=excluded.${k}`).join(', ')}` : 'DO NOTHING';
   return new Promise((resolve, reject) => {
-    getConfig(db, guildId).then((cur) => {
-      const merged = { ...(cur || { guild_id: guildId }), ...patch };
-      const cols = ['guild_id','coin_hub_channel_id','leaderboard_channel_id','shop_channel_id','admin_tx_channel_id','fee_rate','scarcity_threshold'];
-      const vals = cols.map((k) => merged[k] ?? null);
-      db.run(
-        `INSERT INTO config(${cols.join(',')}) VALUES(${cols.map(() => '?').join(',')})
-         ON CONFLICT(guild_id) DO UPDATE SET
-           coin_hub_channel_id=excluded.coin_hub_channel_id,
-           leaderboard_channel_id=excluded.leaderboard_channel_id,
-           shop_channel_id=excluded.shop_channel_id,
-           admin_tx_channel_id=excluded.admin_tx_channel_id,
-           fee_rate=excluded.fee_rate,
-           scarcity_threshold=excluded.scarcity_threshold`,
-        vals,
-        (err) => (err ? reject(err) : resolve(merged))
-      );
-    }, reject);
-  });
+    db.run(
+      `INSERT INTO config(${['guild_id', ...cols].join(',')}) VALUES(${['guild_id', ...cols].map(() => '?').join(',')})
+       ON CONFLICT(guild_id) ${onConflict}`,
+      [guildId, ...cols.map((k) => patch[k])],
+      (err) => (err ? reject(err) : resolve())
+    );
+  }).then(() => getConfig(db, guildId));
 }
 
 export function createListing(db, row) {
@@ -154,6 +190,15 @@ export function getActiveListings(db, guildId) {
   });
 }
 
+export function getActiveListing(db, guildId, listingId) {
+  return new Promise((resolve, reject) => {
+    getOne(db, 'SELECT * FROM listings WHERE listing_id = ? AND guild_id = ? AND status = ?', [listingId, guildId, 'active'], (err, row) => {
+      if (err) return reject(err);
+      resolve(row || null);
+    });
+  });
+}
+
 export function logTx(db, tx) {
   return new Promise((resolve, reject) => {
     db.run(
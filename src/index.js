@@ -1,10 +1,10 @@
 import 'dotenv/config';
 import { Client, GatewayIntentBits, Partials, Events, EmbedBuilder } from 'discord.js';
-import { openDb } from './db.js';
+import { openDb, closeDb } from './db.js';
 import { registerSlashData, handleSlash, getGuildConfig } from './commands.js';
 import { hubButtons, hubEmbed, showCard } from './hub.js';
 import { sellModal, handleSellSubmit, handleBuy } from './shop.js';
-import { getActiveListings } from './db.js';
+import { getActiveListing, getActiveListings } from './db.js';
 
 const token = process.env.DISCORD_TOKEN;
 const databaseUrl = process.env.DATABASE_URL || './data/coins.db';
@@ -14,8 +14,6 @@ const client = new Client({
   intents: [
     GatewayIntentBits.Guilds,
     GatewayIntentBits.GuildMembers,
-    GatewayIntentBits.GuildMessages,
-    GatewayIntentBits.MessageContent,
   ],
   partials: [Partials.Channel]
 });
@@ -35,7 +33,6 @@ client.on(Events.InteractionCreate, async (interaction) => {
     if (ns === 'hub') {
       if (action === 'card') return showCard(db, interaction);
       if (action === 'shop') {
-        const cfg = await getGuildConfig(db, interaction.guildId);
         const listings = await getActiveListings(db, interaction.guildId);
         const e = new EmbedBuilder().setTitle('Shop').setColor(0xE67E22).setDescription(listings.length ? listings.map(l => `• ${l.sku} x${l.qty} — ${l.unit_price} coins (id: ${l.listing_id.slice(0,8)})`).join('\n') : 'No listings yet. Use Sell to create one.');
         return interaction.reply({ embeds: [e], ephemeral: true });
@@ -54,8 +51,7 @@ client.on(Events.InteractionCreate, async (interaction) => {
       }
       if (action === 'buy' && arg) {
         const cfg = await getGuildConfig(db, interaction.guildId);
-        const listings = await getActiveListings(db, interaction.guildId);
-        const listing = listings.find(l => l.listing_id === arg);
+        const listing = await getActiveListing(db, interaction.guildId, arg);
         if (!listing) return interaction.reply({ content: 'Listing not found.', ephemeral: true });
         return handleBuy(db, client, cfg, interaction, listing);
       }
@@ -71,5 +67,13 @@ client.on(Events.InteractionCreate, async (interaction) => {
   }
 });
 
+async function shutdown() {
+  await client.destroy();
+  try { await closeDb(db); } catch (e) { console.error('Failed to close database:', e?.message || e); }
+  process.exit(0);
+}
+process.once('SIGINT', shutdown);
+process.once('SIGTERM', shutdown);
+
 client.login(token);
 
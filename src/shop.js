@@ -3,14 +3,15 @@ import { ActionRowBuilder, ButtonBuilder, ButtonStyle, EmbedBuilder, ModalBuilde
 import { createListing, getActiveListings, updateBalances, getUser, logTx } from './db.js';
 import { sendAdminLog } from './adminFeed.js';
 
+// The modal is identical for every Sell click, so it is built once and reused.
+const SELL_MODAL = new ModalBuilder().setCustomId('shop:sellmodal').setTitle('Create Listing').addComponents(
+  new ActionRowBuilder().addComponents(new TextInputBuilder().setCustomId('sku').setLabel('SKU / Item').setStyle(TextInputStyle.Short).setRequired(true)),
+  new ActionRowBuilder().addComponents(new TextInputBuilder().setCustomId('qty').setLabel('Quantity').setStyle(TextInputStyle.Short).setRequired(true)),
+  new ActionRowBuilder().addComponents(new TextInputBuilder().setCustomId('price').setLabel('Unit Price').setStyle(TextInputStyle.Short).setRequired(true))
+);
+
 export function sellModal() {
-  const m = new ModalBuilder().setCustomId('shop:sellmodal').setTitle('Create Listing');
-  m.addComponents(
-    new ActionRowBuilder().addComponents(new TextInputBuilder().setCustomId('sku').setLabel('SKU / Item').setStyle(TextInputStyle.Short).setRequired(true)),
-    new ActionRowBuilder().addComponents(new TextInputBuilder().setCustomId('qty').setLabel('Quantity').setStyle(TextInputStyle.Short).setRequired(true)),
-    new ActionRowBuilder().addComponents(new TextInputBuilder().setCustomId('price').setLabel('Unit Price').setStyle(TextInputStyle.Short).setRequired(true))
-  );
-  return m;
+  return SELL_MODAL;
 }
 
 export async function handleSellSubmit(db, client, cfg, interaction) {